@@ -8,25 +8,22 @@ output_file = "ox문제_with_explain.txt"
 # 문제 패턴 (마지막 (O) 또는 (X) 찾기)
 pattern = re.compile(r"(.*?\(\s*[OX]\s*\))")
 
-with open(input_file, "r", encoding="utf-8") as f:
-    lines = f.readlines()
-
-new_lines = []
-for line in lines:
-    line = line.strip()
-    if not line:
-        continue
-    m = pattern.match(line)
-    if m:
-        # 이미 설명이 들어간 문제는 건너뛰기
-        if "[설명:" in line or "[오답:" in line:
-            new_lines.append(line)
+# readlines()로 전체를 메모리에 올리지 않고 한 줄씩 읽어 바로 기록
+with open(input_file, "r", encoding="utf-8") as f, \
+     open(output_file, "w", encoding="utf-8") as out:
+    first = True
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        # 이미 설명이 들어간 줄은 정규식 검사 없이 그대로 통과
+        if "[설명:" in line or "[오답:" in line or not pattern.match(line):
+            processed = line
         else:
-            new_lines.append(f"{line} [설명: ] [오답: ]")
-    else:
-        new_lines.append(line)
-
-with open(output_file, "w", encoding="utf-8") as f:
-    f.write("\n".join(new_lines))
+            processed = f"{line} [설명: ] [오답: ]"
+        if not first:
+            out.write("\n")
+        out.write(processed)
+        first = False
 
 print(f"완성된 파일: {output_file}")
@@ -1,6 +1,7 @@
+import functools
+import io
 import re
 import random
-import time
 import pandas as pd
 import streamlit as st
 
@@ -19,31 +20,37 @@ ROW_RE = re.compile(
         \s*\(\s*(?P<a>[OX])\s*\)\s*        # (O) 또는 (X)
         (?P<meta>(?:\[[^\]]+\]\s*)*)$      # (선택) [설명:...][오답:...]
     """,
+    # re.A 금지: \s가 전각 공백(U+3000), \d가 전각 숫자도 받아야 함
     re.M | re.VERBOSE
 )
 
 META_RE = re.compile(r"\[\s*(설명|해설|오답|오답설명)\s*:\s*([^\]]+)\]")
 
+@st.cache_data(show_spinner=False)
 def parse_questions(text: str):
-    items = []
-    for line in text.replace("\r\n", "\n").split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        m = ROW_RE.match(line)
-        if not m:
-            continue
-        q = m.group("q").strip()
-        a = m.group("a").strip().upper()
+    """문제/정답/해설/오답해설을 dict 리스트 대신 4개의 병렬 리스트로 반환."""
+    qs, ans, exps, exp_wrongs = [], [], [], []
+    # re.M 덕분에 ^/$ 가 줄 단위로 동작 → split/strip 루프 없이 한 번에 스캔
+    for m in ROW_RE.finditer(text.replace("\r\n", "\n")):
         meta = m.group("meta") or ""
         exp, exp_wrong = "", ""
-        for k, v in META_RE.findall(meta):
-            if k in ("설명", "해설"):
-                exp = v.strip()
-            elif k in ("오답", "오답설명"):
-                exp_wrong = v.strip()
-        items.append({"q": q, "a": a, "exp": exp, "exp_wrong": exp_wrong})
-    return items
+        if "[" in meta:  # 메타 없는 행에서 정규식 호출 자체를 생략
+            for k, v in META_RE.findall(meta):
+                if k in ("설명", "해설"):
+                    exp = v.strip()
+                elif k in ("오답", "오답설명"):
+                    exp_wrong = v.strip()
+        qs.append(m.group("q").strip())
+        ans.append(m.group("a").strip().upper())
+        # 금액 표기 보강은 클릭 시점이 아니라 여기서 1회만
+        exps.append(enrich_money(exp) if exp else "")
+        exp_wrongs.append(enrich_money(exp_wrong) if exp_wrong else "")
+    return qs, ans, exps, exp_wrongs
+
+@st.cache_data(show_spinner=False)
+def parse_uploaded_questions(data: bytes):
+    # 업로드 원본 bytes를 키로 캐시 → 파싱은 파일당 1회, 이후 rerun은 캐시 히트
+    return parse_questions(data.decode("utf-8", "ignore"))
 
 @st.cache_data(show_spinner=False)
 def load_default_questions():
@@ -54,7 +61,7 @@ def load_default_questions():
                 return parse_questions(f.read())
         except Exception:
             pass
-    return []
+    return [], [], [], []
 
 # =========================
 # 금액(원) 표기 보강
@@ -67,29 +74,66 @@ UNIT_FACTORS = {
     "천만원": 10_000_000,
     "억원": 100_000_000,
 }
-# 3.5만원, 2억원, 12만 원 등 포착
-MONEY_WITH_UNIT = re.compile(r"(\d+(?:\.\d+)?)\s*(천원|만원|십만원|백만원|천만원|억원)")
-MONEY_WON = re.compile(r"(\d{1,3}(?:,\d{3})+|\d+)\s*원")
+# 3.5만원, 2억원 같은 단위 표기와 콤마 없는 1234원을 한 패턴으로 포착
+MONEY_RE = re.compile(
+    r"(?P<num>\d+(?:\.\d+)?)\s*(?P<unit>천원|만원|십만원|백만원|천만원|억원)"
+    r"|(?P<won>\d{1,3}(?:,\d{3})+|\d+)\s*원",
+    re.A
+)
 
-def enrich_money(text: str) -> str:
-    """만원/억원 등 → 원 단위 환산값을 ( …원 )으로 덧붙여 정확히 보여줌."""
-    def repl_unit(m):
-        num = float(m.group(1))
-        unit = m.group(2)
-        factor = UNIT_FACTORS[unit]
-        val = int(round(num * factor))
+def _repl_money(m):
+    if m.group("unit"):
+        val = int(round(float(m.group("num")) * UNIT_FACTORS[m.group("unit")]))
         return f"{m.group(0)}(={val:,}원)"
-    text = MONEY_WITH_UNIT.sub(repl_unit, text)
     # 이미 '원'으로 끝나는 숫자는 콤마가 없다면 콤마 추가
-    def repl_won(m):
-        raw = m.group(1).replace(",", "")
-        try:
-            val = int(float(raw))
-            return f"{val:,}원"
-        except:
-            return m.group(0)
-    text = MONEY_WON.sub(repl_won, text)
-    return text
+    raw = m.group("won").replace(",", "")
+    try:
+        return f"{int(float(raw)):,}원"
+    except:
+        return m.group(0)
+
+@functools.lru_cache(maxsize=4096)
+def enrich_money(text: str) -> str:
+    """만원/억원 등 → 원 단위 환산값을 ( …원 )으로 덧붙여 정확히 보여줌.
+
+    파싱 시점에 해설마다 1회 호출됨. 중복 해설/재파싱 대비 캐시 유지.
+    """
+    return MONEY_RE.sub(_repl_money, text)
+
+UNANSWERED = ord("?")   # answers bytearray에서 미응답 표시
+
+# =========================
+# 결과 집계
+# =========================
+@st.cache_data(show_spinner=False)
+def build_results(qs: tuple, key: bytes, answers: bytes):
+    """채점 + 결과표 HTML + CSV 바이트를 생성. 입력이 같으면 캐시 히트."""
+    oks = [u == c for u, c in zip(answers, key)]
+    correct = sum(oks)
+    ans = list(key.decode("ascii"))
+    shown = ["무응답" if u == UNANSWERED else chr(u) for u in answers]
+    marks = ["✅" if ok else "❌" for ok in oks]
+    # 표는 Arrow 직렬화 없이 정적 HTML로 렌더 (100행 제한, 전체는 CSV로)
+    body = "\n".join(
+        f"<tr><td>{i}</td><td>{q_}</td><td>{c}</td><td>{u}</td><td>{mk}</td></tr>"
+        for i, (q_, c, u, mk) in enumerate(zip(qs[:100], ans, shown, marks), 1)
+    )
+    html = (
+        "<table class='result-table'>"
+        "<tr><th>No.</th><th>문제</th><th>정답</th><th>내 답</th><th>판정</th></tr>\n"
+        f"{body}</table>"
+    )
+    # DataFrame은 CSV 인코딩에만 사용 (str 전체 대신 바이트 버퍼에 바로 기록)
+    df = pd.DataFrame({
+        "No.": range(1, len(qs) + 1),
+        "문제": list(qs),
+        "정답": ans,
+        "내 답": shown,
+        "판정": marks,
+    })
+    csv_buf = io.BytesIO()
+    df.to_csv(csv_buf, index=False, encoding="utf-8-sig")
+    return correct, html, csv_buf.getvalue()
 
 # =========================
 # 세션 상태 초기화
@@ -98,14 +142,19 @@ def init_state():
     ss = st.session_state
     ss.setdefault("started", False)
     ss.setdefault("order", [])
+    ss.setdefault("key", b"")        # order와 정렬된 정답 바이트열(b"OX...")
+    ss.setdefault("qtext", [])       # order와 정렬된 문제 배열
+    ss.setdefault("titles", [])      # "문제 N / M" 문자열 (퀴즈 시작 시 생성)
     ss.setdefault("current", 0)
-    ss.setdefault("answers", {})
+    ss.setdefault("answers", bytearray())  # 문항 위치별 답(O/X/?), 1문항 1바이트
+    ss.setdefault("wrong", set())    # 오답 인덱스(O(1) 추가/조회)
     ss.setdefault("submitted", False)
     ss.setdefault("retry_mode", False)
     ss.setdefault("feedback", None)      # 정답/오답 메시지
     ss.setdefault("explain", None)       # 해설 문자열
 
 init_state()
+ss = st.session_state   # rerun마다 프록시 속성 접근 비용을 줄이기 위한 지역 별칭
 
 # =========================
 # 스타일
@@ -118,19 +167,32 @@ st.markdown("""
 }
 .quiz-title { font-weight:800; font-size:1.3rem; margin-bottom:.6rem; }
 .explain { background:#f7f9ff; border-left:6px solid #5b8def; padding:1rem 1.2rem; border-radius:.6rem; }
+.feedback { background:#e8f0fe; padding:.8rem 1.2rem; border-radius:.6rem; font-weight:600; margin-bottom:.6rem; }
 .explain h4 { margin:0 0 .3rem 0; font-size:1rem; }
 .stButton button { height:3rem; font-size:1.05rem; font-weight:700; border-radius:.7rem; }
+.result-table { width:100%; border-collapse:collapse; }
+.result-table th, .result-table td { border-bottom:1px solid #eee; padding:.4rem .5rem; font-size:.95rem; text-align:left; }
 </style>
 """, unsafe_allow_html=True)
 
+# rerun마다 다시 이어붙이지 않도록 카드/해설 HTML의 고정 부분을 상수로
+_CARD_PRE = "<div class='quiz-card'><div class='quiz-title'>"
+_CARD_MID = "</div><div style='font-size:1.12rem;'>"
+_CARD_POST = "</div></div>"
+_EXPLAIN_PRE = "<div class='explain'><h4>해설</h4>"
+_EXPLAIN_POST = "</div>"
+
 # =========================
 # 사이드바
 # =========================
 st.sidebar.title("⚙️ 설정")
 uploaded = st.sidebar.file_uploader("퀴즈 텍스트 업로드 (.txt)", type=["txt"])
 
-pool = parse_questions(uploaded.read().decode("utf-8", "ignore")) if uploaded else load_default_questions()
-total = len(pool)
+# SoA: 문제/정답/해설을 병렬 리스트로 유지 → 핫패스는 dict 해싱 없이 인덱싱만
+pool_q, pool_a, pool_exp, pool_exp_wrong = (
+    parse_uploaded_questions(uploaded.getvalue()) if uploaded else load_default_questions()
+)
+total = len(pool_q)
 if total == 0:
     st.error("문제를 불러오지 못했습니다. `ox문제.txt` 형식을 확인하세요.")
     st.stop()
@@ -138,19 +200,22 @@ if total == 0:
 num_q = st.sidebar.slider("퀴즈 문제 수", 5, total, min(10, total))
 shuffle = st.sidebar.checkbox("문항 섞기", True)
 auto_next = st.sidebar.checkbox("정답 후 자동 넘김", True)
-delay = st.sidebar.slider("자동 넘김 지연(초)", 1.0, 4.0, 2.0, .5)
 
 def start_quiz():
-    indices = list(range(total))
-    if shuffle: random.shuffle(indices)
-    st.session_state.order = indices[:num_q]
-    st.session_state.current = 0
-    st.session_state.answers = {}
-    st.session_state.submitted = False
-    st.session_state.retry_mode = False
-    st.session_state.feedback = None
-    st.session_state.explain = None
-    st.session_state.started = True
+    # 전체를 섞고 자르는 대신 필요한 개수만 부분 Fisher-Yates로 추출
+    ss.order = random.sample(range(total), num_q) if shuffle else list(range(num_q))
+    # 매 rerun마다 pool 전체를 뒤지지 않도록 정답/문제를 미리 배열로
+    ss.key = "".join(pool_a[i] for i in ss.order).encode("ascii")
+    ss.qtext = [pool_q[i] for i in ss.order]
+    ss.titles = [f"문제 {i + 1} / {num_q}" for i in range(num_q)]
+    ss.current = 0
+    ss.answers = bytearray([UNANSWERED] * num_q)
+    ss.wrong = set()
+    ss.submitted = False
+    ss.retry_mode = False
+    ss.feedback = None
+    ss.explain = None
+    ss.started = True
 
 if st.sidebar.button("🚀 시작"):
     start_quiz()
@@ -160,104 +225,121 @@ if st.sidebar.button("🚀 시작"):
 # =========================
 st.title("🎯 OX 퀴즈")
 
-if not st.session_state.started:
+if not ss.started:
     st.info("좌측에서 문제 수를 정하고 **시작**을 눌러주세요.")
     st.stop()
 
-order = st.session_state.order
+order = ss.order
 n_total = len(order)
 
 # 결과/종료 가드
-if st.session_state.submitted or st.session_state.current >= n_total:
-    st.session_state.submitted = True
-    # 성적표
-    rows, correct = [], 0
-    for i, qidx in enumerate(order, 1):
-        q = pool[qidx]["q"]; a = pool[qidx]["a"]
-        u = st.session_state.answers.get(qidx, "")
-        ok = (u == a); correct += int(ok)
-        rows.append({"No.": i, "문제": q, "정답": a, "내 답": u or "무응답", "판정": "✅" if ok else "❌"})
-    st.success(f"완료! 점수: **{correct}/{n_total}** ({round(correct/n_total*100,1)}%)")
-    st.progress(correct / max(1, n_total))
-    if rows:
-        df = pd.DataFrame(rows)
-        st.dataframe(df, use_container_width=True, hide_index=True)
-        st.download_button("📥 결과 CSV 다운로드", df.to_csv(index=False).encode("utf-8-sig"),
-                           "ox_quiz_results.csv", "text/csv")
+if ss.submitted or ss.current >= n_total:
+    ss.submitted = True
+    # 점수는 바이트 비교 한 번으로 충분 — 표/CSV보다 먼저, 싸게 계산
+    correct = sum(u == c for u, c in zip(ss.answers, ss.key))
+    ratio = correct / n_total if n_total else 0.0
+    st.success(f"완료! 점수: **{correct}/{n_total}** ({ratio*100:.1f}%)")
+    st.progress(ratio)
 
-    # 오답 다시 풀기
-    if not st.session_state.retry_mode:
-        wrong = [i for i in order if st.session_state.answers.get(i, "") != pool[i]["a"]]
+    # 버튼을 표 생성보다 먼저 처리 → 클릭 rerun은 표/CSV 작업 없이 바로 전환
+    if not ss.retry_mode:
+        wrong = ss.wrong
         if wrong and st.button("❗ 오답만 다시 풀기"):
-            st.session_state.order = wrong
-            st.session_state.current = 0
-            st.session_state.answers = {}
-            st.session_state.retry_mode = True
-            st.session_state.submitted = False
+            ss.order = [i for i in order if i in wrong]
+            ss.key = "".join(pool_a[i] for i in ss.order).encode("ascii")
+            ss.qtext = [pool_q[i] for i in ss.order]
+            n_retry = len(ss.order)
+            ss.titles = [f"문제 {i + 1} / {n_retry}" for i in range(n_retry)]
+            ss.current = 0
+            ss.answers = bytearray([UNANSWERED] * len(ss.order))
+            ss.wrong = set()
+            ss.retry_mode = True
+            ss.submitted = False
+            ss.feedback = None
+            ss.explain = None
             st.rerun()
         elif not wrong:
             st.info("완벽해요! 오답이 없습니다.")
     if st.button("🔄 처음부터 다시"):
         start_quiz(); st.rerun()
+
+    # 성적표 — 표 HTML/CSV는 순수 함수로 묶어 st.cache_data에 위임
+    if order:
+        _, results_html, results_csv = build_results(
+            tuple(ss.qtext), ss.key, bytes(ss.answers)
+        )
+        st.markdown(results_html, unsafe_allow_html=True)
+        if n_total > 100:
+            st.caption(f"표에는 100행까지만 표시됩니다. 전체 {n_total}행은 CSV로 받으세요.")
+        st.download_button("📥 결과 CSV 다운로드", results_csv,
+                           "ox_quiz_results.csv", "text/csv")
     st.stop()
 
-# 현재 문제
-qidx = order[st.session_state.current]
-q = pool[qidx]["q"]; a = pool[qidx]["a"]
-exp = pool[qidx]["exp"]; exp_wrong = pool[qidx]["exp_wrong"]
-
-st.progress((st.session_state.current + 1) / n_total)
-st.markdown(
-    f"<div class='quiz-card'>"
-    f"<div class='quiz-title'>문제 {st.session_state.current + 1} / {n_total}</div>"
-    f"<div style='font-size:1.12rem;'>{q}</div></div>",
-    unsafe_allow_html=True
-)
+# 문제 카드 전체를 fragment로 → 답변 시 타이틀/사이드바/CSS는 재실행되지 않음
+@st.fragment
+def quiz_card():
+    # 방금 답변으로 퀴즈가 끝났으면 전체 rerun으로 결과 화면에 진입
+    if ss.submitted or ss.current >= n_total:
+        st.rerun()
 
-# O / X 선택
-c1, c2 = st.columns(2, gap="large")
-def handle(choice):
-    st.session_state.answers[qidx] = choice
-    is_correct = (choice == a)
-    # 메시지
-    st.session_state.feedback = "✅ 정답입니다!" if is_correct else f"❌ 오답! 정답은 {a}"
-    # 해설 선택(오답이면 오답 해설 우선)
-    what = (exp if is_correct else (exp_wrong or exp)).strip()
-    if what:
-        st.session_state.explain = enrich_money(what)  # 금액 표기 보강
-    else:
-        st.session_state.explain = None
-    st.rerun()
-
-with c1:
-    if st.button("⭕", use_container_width=True):
-        handle("O")
-with c2:
-    if st.button("❌", use_container_width=True):
-        handle("X")
-
-# 피드백 + 해설 + 자동 넘김
-if st.session_state.feedback:
-    st.info(st.session_state.feedback)
-    if st.session_state.explain:
-        st.markdown(f"<div class='explain'><h4>해설</h4>{st.session_state.explain}</div>", unsafe_allow_html=True)
-
-    coln1, coln2, coln3 = st.columns([1,1,1])
-    with coln2:
-        if st.button("➡️ 다음 문제", use_container_width=True):
-            st.session_state.feedback = None
-            st.session_state.explain = None
-            st.session_state.current += 1
-            if st.session_state.current >= n_total:
-                st.session_state.submitted = True
-            st.rerun()
+    # 피드백 + 해설 (자동 넘김이면 직전 문제의 피드백이 다음 문제 위에 표시됨)
+    if ss.feedback:
+        # 피드백과 해설을 위젯 2개 대신 markdown 1개로 전송 (ForwardMsg 절약)
+        fb_html = f"<div class='feedback'>{ss.feedback}</div>"
+        if ss.explain:
+            fb_html += f"{_EXPLAIN_PRE}{ss.explain}{_EXPLAIN_POST}"
+        st.markdown(fb_html, unsafe_allow_html=True)
 
-    if auto_next:
-        # 잠깐 읽을 수 있도록 지연 후 자동 이동
-        time.sleep(float(delay))
-        st.session_state.feedback = None
-        st.session_state.explain = None
-        st.session_state.current += 1
-        if st.session_state.current >= n_total:
-            st.session_state.submitted = True
-        st.rerun()
+        if not auto_next:
+            # 콜백에서 넘겨야 fragment rerun이 피드백 없는 새 문제를 그림
+            # (퀴즈가 끝나면 fragment 첫 줄의 가드가 전체 rerun으로 탈출)
+            def advance():
+                ss.feedback = None
+                ss.explain = None
+                ss.current += 1
+                if ss.current >= n_total:
+                    ss.submitted = True
+
+            coln1, coln2, coln3 = st.columns([1,1,1])
+            with coln2:
+                st.button("➡️ 다음 문제", use_container_width=True, on_click=advance)
+
+    # 현재 문제
+    cur = ss.current
+    qidx = order[cur]
+    q = ss.qtext[cur]; a = chr(ss.key[cur])
+    exp = pool_exp[qidx]; exp_wrong = pool_exp_wrong[qidx]
+
+    st.progress((cur + 1) / n_total)
+    st.markdown(
+        f"{_CARD_PRE}{ss.titles[cur]}{_CARD_MID}{q}{_CARD_POST}",
+        unsafe_allow_html=True
+    )
+
+    # O / X 선택 (버튼 2개 대신 라디오 1개 → 위젯 수·수동 rerun 감소)
+    def handle():
+        choice = ss[f"choice_{qidx}"]
+        ss.answers[cur] = ord(choice)
+        is_correct = (choice == a)
+        if not is_correct:
+            ss.wrong.add(qidx)
+        else:
+            # 라디오로 답을 고쳐 맞힌 경우 집합을 answers와 일치시킴
+            ss.wrong.discard(qidx)
+        # 메시지
+        ss.feedback = "✅ 정답입니다!" if is_correct else f"❌ 오답! 정답은 {a}"
+        # 해설 선택(오답이면 오답 해설 우선) — 파싱 때 이미 금액 표기까지 보강됨
+        ss.explain = (exp if is_correct else (exp_wrong or exp)) or None
+        if auto_next:
+            # 서버 스레드를 sleep으로 붙잡는 대신 즉시 넘어가고
+            # 피드백은 다음 화면 상단에서 보여줌
+            ss.current += 1
+            if ss.current >= n_total:
+                ss.submitted = True
+
+    st.radio("정답 선택", ["O", "X"], index=None, horizontal=True,
+             format_func=lambda v: "⭕" if v == "O" else "❌",
+             key=f"choice_{qidx}", on_change=handle,
+             label_visibility="collapsed")
+
+quiz_card()